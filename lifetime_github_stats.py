@@ -4,22 +4,93 @@ GitHub Code Statistics Analyzer
 Analyzes total lines of code contributed across all GitHub repositories.
 """
 
-import requests
+import asyncio
+import enum
+import functools
+import aiohttp
+import orjson
 import time
-import os
-import json
+import random
+import re
+import sqlite3
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Callable, Coroutine, Dict, Final, List, Literal, Tuple, Optional, Union
 import sys
 
 # Configuration
 GITHUB_USERNAME = ""
 GITHUB_TOKEN = ""  # ignore
 API_BASE = "https://api.github.com"
-CACHE_FILE = "github_stats_cache.json"
-RATE_LIMIT_DELAY = 1.0  # seconds between requests
-STATS_RETRY_DELAY = 5.0  # seconds to wait when stats are being computed
-MAX_STATS_RETRIES = 6  # maximum retries for stats APIs (30 seconds total)
+GRAPHQL_URL = f"{API_BASE}/graphql"
+CACHE_FILE = "github_stats_cache.db"  # SQLite key-value store, one row per cache entry
+RATE_LIMIT_THRESHOLD = 100  # remaining requests below which requests are paced until the reset
+STATS_RETRY_BASE_DELAY = 1.0  # initial backoff when stats are being computed
+STATS_RETRY_MAX_DELAY = 60.0  # upper bound for a single backoff step
+MAX_STATS_RETRIES = 6  # maximum retries for stats APIs (~30 seconds of backoff)
+STATS_UNAVAILABLE_COOLDOWN = 86400  # seconds to skip contributor stats for a repo that never finished computing
+MAX_CONCURRENT_REQUESTS = 16  # API requests in flight at once, shared by all repositories
+MAX_CONNECTIONS = 64  # size of the keep-alive connection pool
+KEEPALIVE_TIMEOUT = 60.0  # seconds an idle connection is kept open for reuse
+CONNECT_TIMEOUT = 5.0  # seconds to establish a connection before giving up
+READ_TIMEOUT = 30.0  # seconds to wait for response data
+MAX_REQUEST_RETRIES = 5  # attempts for a request that times out or hits the rate limit
+LARGE_RESPONSE_BYTES = 256 * 1024  # bodies above this size are decoded off the event loop
+LAST_PAGE_PATTERN = re.compile(r'[?&]page=(\d+)[^>]*>;\s*rel="last"')
+EXACT_STATS_SOURCES = ('history', 'contributors')  # sources whose totals hold until the next push
+
+# Line counts of the user's commits on the default branch, one page at a time
+COMMIT_HISTORY_QUERY = """
+query($owner: String!, $name: String!, $author: ID!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history(first: 100, after: $cursor, author: {id: $author}) {
+            nodes { additions deletions }
+            pageInfo { hasNextPage endCursor }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+class NotModified(enum.Enum):
+    """Sentinel returned by conditional requests answered with 304."""
+    NOT_MODIFIED = "not modified"
+
+NOT_MODIFIED: Final = NotModified.NOT_MODIFIED
+NotModifiedType = Literal[NotModified.NOT_MODIFIED]
+
+# (additions, deletions, etag of the response the counts were derived from)
+StatsCounts = Tuple[int, int, Optional[str]]
+# Conditional lookups return either their result or the NOT_MODIFIED sentinel
+StatsResult = Union[StatsCounts, NotModifiedType]
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter, so parallel retries don't fire in lockstep."""
+    return min(STATS_RETRY_MAX_DELAY, STATS_RETRY_BASE_DELAY * 2 ** attempt) + random.uniform(0, 1)
+
+def retry_while_computing(max_attempts: int = MAX_STATS_RETRIES):
+    """Retry a coroutine returning a stats response while GitHub answers 202 (still computing).
+    
+    The last response is returned as is, so a 202 after ``max_attempts`` means the stats never became ready.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(max_attempts):
+                response = await func(*args, **kwargs)
+                if response is None or response is NOT_MODIFIED or response.status != 202:
+                    break
+                if attempt + 1 < max_attempts:
+                    delay = _backoff_delay(attempt)
+                    print(f"    Stats computing... waiting {delay:.1f}s (attempt {attempt+1}/{max_attempts})")
+                    await asyncio.sleep(delay)
+            return response
+        return wrapper
+    return decorator
 
 class GitHubStatsAnalyzer:
     def __init__(self, username: str, token: str):
@@ -29,290 +100,638 @@ class GitHubStatsAnalyzer:
             "Accept": "application/vnd.github+json",
             "X-GitHub-Api-Version": "2022-11-28"
         }
+        self._db = self._open_cache_db()
         self.cache = self._load_cache()
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
-        
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._user_id_lock: Optional[asyncio.Lock] = None
+        # Set when the user ID lookup fails, so the remaining repositories go straight to REST
+        self._graphql_unavailable = False
+        # Rate limit budget as last reported by GitHub
+        self._remaining: Optional[int] = None
+        self._reset_at = 0.0
+        # Time at which the next paced request may go out, shared by all tasks
+        self._next_request_at = 0.0
+        self._pace_lock: Optional[asyncio.Lock] = None
+
+    async def run(self):
+        """Open the HTTP session and analyze all repositories."""
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self._user_id_lock = asyncio.Lock()
+        self._pace_lock = asyncio.Lock()
+        # Keep enough warm connections for every concurrent request so none pays a fresh TLS handshake
+        connector = aiohttp.TCPConnector(
+            limit=MAX_CONNECTIONS,
+            limit_per_host=MAX_CONNECTIONS,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        async with aiohttp.ClientSession(
+            headers=self.headers,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT),
+            json_serialize=lambda obj: orjson.dumps(obj).decode(),
+        ) as session:
+            self.session = session
+            try:
+                return await self.analyze_all_repositories()
+            finally:
+                self.session = None
+
+    def _open_cache_db(self) -> Optional[sqlite3.Connection]:
+        """Open the cache database, creating its table if needed."""
+        try:
+            db = sqlite3.connect(CACHE_FILE)
+            db.execute("CREATE TABLE IF NOT EXISTS kv (k TEXT PRIMARY KEY, v BLOB)")
+            return db
+        except Exception as e:
+            print(f"Warning: Could not open cache: {e}")
+            return None
+    
     def _load_cache(self) -> Dict:
         """Load cached data if available."""
         try:
-            if os.path.exists(CACHE_FILE):
-                with open(CACHE_FILE, 'r') as f:
-                    return json.load(f)
+            if self._db is not None:
+                return {key: orjson.loads(value) for key, value in self._db.execute("SELECT k, v FROM kv")}
         except Exception as e:
             print(f"Warning: Could not load cache: {e}")
         return {}
     
-    def _save_cache(self):
-        """Save cache data."""
+    def _save_cache(self, *keys: str):
+        """Save cache data, or only the given entries."""
+        if self._db is None:
+            return
         try:
-            with open(CACHE_FILE, 'w') as f:
-                json.dump(self.cache, f, indent=2)
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO kv VALUES (?, ?)",
+                    [(key, orjson.dumps(self.cache[key])) for key in keys or self.cache]
+                )
         except Exception as e:
             print(f"Warning: Could not save cache: {e}")
     
-    def _make_request(self, url: str, params: Optional[Dict] = None, allow_non_200: bool = False) -> Optional[requests.Response]:
-        """Make a rate-limited API request with error handling."""
-        try:
-            response = self.session.get(url, params=params)
-            
-            # Handle rate limiting
-            if response.status_code == 403 and 'rate limit' in response.text.lower():
-                reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
-                wait_time = max(reset_time - int(time.time()), 60)
-                print(f"Rate limit hit. Waiting {wait_time} seconds...")
-                time.sleep(wait_time)
-                return self._make_request(url, params, allow_non_200)
-            
-            # For stats APIs, we need to handle 202 and 204 specially
-            if allow_non_200:
-                time.sleep(RATE_LIMIT_DELAY)
-                return response
-            elif response.status_code == 200:
-                time.sleep(RATE_LIMIT_DELAY)
-                return response
-            else:
-                return None
+    def _close_cache(self):
+        """Close the cache database."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+    
+    def _update_rate_limit(self, response: aiohttp.ClientResponse):
+        """Record the rate limit budget reported in the response headers."""
+        if 'X-RateLimit-Remaining' in response.headers:
+            self._remaining = int(response.headers['X-RateLimit-Remaining'])
+            self._reset_at = float(response.headers.get('X-RateLimit-Reset', 0))
+    
+    async def _throttle(self):
+        """Wait for this request's slot once the rate limit budget runs low.
+        
+        The remaining requests are spread evenly until the reset. Slots are
+        handed out one pacing delay apart under a lock, so concurrent tasks
+        queue up behind each other instead of all sleeping the same delay and
+        then firing together.
+        """
+        if self._remaining is None or self._remaining >= RATE_LIMIT_THRESHOLD:
+            return
+        async with self._pace_lock:
+            now = time.time()
+            # Computed per slot, so the delay shrinks to zero once the reset time passes
+            pace_delay = max(0, self._reset_at - now) / max(self._remaining, 1)
+            slot = max(now, self._next_request_at)
+            self._next_request_at = slot + pace_delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+    
+    async def _make_request(self, url: str, params: Optional[Dict] = None, allow_non_200: bool = False,
+                            etag: Optional[str] = None) -> Union[aiohttp.ClientResponse, NotModifiedType, None]:
+        """Make a rate-limited API request with error handling.
+        
+        When an ``etag`` is given the request is made conditional, and
+        ``NOT_MODIFIED`` is returned if GitHub answers 304. Timeouts and
+        rate limit hits are retried up to MAX_REQUEST_RETRIES attempts.
+        """
+        for attempt in range(MAX_REQUEST_RETRIES):
+            try:
+                await self._throttle()
+                headers = {"If-None-Match": etag} if etag else None
+                async with self._semaphore:
+                    response = await self.session.get(url, params=params, headers=headers)
+                    await response.read()  # buffer the body so the connection returns to the pool
+                self._update_rate_limit(response)
                 
-        except Exception as e:
-            print(f"    Request error for {url}: {e}")
-            return None
+                # Handle rate limiting: wait exactly until the limit resets
+                if response.status == 403 and 'rate limit' in (await response.text()).lower():
+                    if 'Retry-After' in response.headers:
+                        wait_time = int(response.headers['Retry-After'])
+                    elif 'X-RateLimit-Reset' in response.headers:
+                        wait_time = max(int(response.headers['X-RateLimit-Reset']) - time.time(), 0) + 1
+                    else:
+                        wait_time = 60
+                    print(f"Rate limit hit. Waiting {wait_time:.0f} seconds...")
+                    await asyncio.sleep(wait_time)
+                    continue
+                
+                if response.status == 304:
+                    return NOT_MODIFIED
+                
+                # For stats APIs, we need to handle 202 and 204 specially
+                if allow_non_200:
+                    return response
+                elif response.status == 200:
+                    return response
+                else:
+                    return None
+                    
+            except asyncio.TimeoutError:
+                if attempt + 1 < MAX_REQUEST_RETRIES:
+                    delay = _backoff_delay(attempt)
+                    print(f"    Request timed out for {url}, retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+            except Exception as e:
+                print(f"    Request error for {url}: {e}")
+                return None
+        
+        print(f"    Giving up on {url} after {MAX_REQUEST_RETRIES} attempts")
+        return None
     
-    def _get_paginated_data(self, url: str, params: Optional[Dict] = None) -> List[Dict]:
-        """Get all pages of data from a paginated endpoint."""
-        results = []
-        page = 1
+    async def _decode_json(self, response: aiohttp.ClientResponse):
+        """Decode a JSON response body, handing large bodies to a worker thread.
+        
+        Decoding a multi-megabyte stats payload inline would stall every other
+        request on the event loop until it finishes.
+        """
+        body = await response.read()
+        if len(body) > LARGE_RESPONSE_BYTES:
+            return await asyncio.to_thread(orjson.loads, body)
+        return orjson.loads(body)
+    
+    async def _graphql_request(self, query: str, variables: Dict) -> Optional[Dict]:
+        """Run a GraphQL query and return its data, or None on errors.
+        
+        Timeouts and server errors are retried with backoff up to
+        MAX_REQUEST_RETRIES attempts; query errors are returned right away.
+        GraphQL has its own point-based rate limit, so its headers don't feed the REST throttle.
+        """
+        for attempt in range(MAX_REQUEST_RETRIES):
+            try:
+                async with self._semaphore:
+                    response = await self.session.post(GRAPHQL_URL, json={"query": query, "variables": variables})
+                    await response.read()  # buffer the body so the connection returns to the pool
+                if response.status < 500:
+                    payload = await self._decode_json(response)
+                    if response.status != 200 or payload.get('errors'):
+                        errors = payload.get('errors') or [{}]
+                        print(f"    GraphQL error {response.status}: {errors[0].get('message', '')[:100]}")
+                        return None
+                    return payload.get('data')
+                failure = f"server error {response.status}"
+                    
+            except asyncio.TimeoutError:
+                failure = "timeout"
+            except Exception as e:
+                print(f"    GraphQL request error: {e}")
+                return None
+            
+            if attempt + 1 < MAX_REQUEST_RETRIES:
+                delay = _backoff_delay(attempt)
+                print(f"    GraphQL {failure}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        
+        print(f"    Giving up on GraphQL request after {MAX_REQUEST_RETRIES} attempts")
+        return None
+    
+    async def _get_paginated_data(self, url: str, params: Optional[Dict] = None,
+                                  cache_key: Optional[str] = None) -> List[Dict]:
+        """Get all pages of data from a paginated endpoint.
+        
+        The first page is fetched alone to read the page count from its
+        ``Link: rel="last"`` header; the remaining pages are fetched concurrently.
+        With a ``cache_key``, every page is stored with its ETag and revalidated
+        on the next run, so unchanged pages come back as bodiless 304s.
+        """
         per_page = 100
+        cached_pages = self.cache.get(cache_key, {}).get('pages', []) if cache_key else []
         
-        while True:
+        async def fetch_page(page: int) -> Optional[Tuple[List[Dict], Optional[str], str, bool]]:
+            """Fetch one page, returning its items, ETag, Link header and whether it was a 304."""
             current_params = {"page": page, "per_page": per_page}
             if params:
                 current_params.update(params)
-                
-            response = self._make_request(url, current_params)
-            if not response:
-                break
-                
-            data = response.json()
-            if not data or len(data) == 0:
-                break
-                
-            results.extend(data)
-            page += 1
-            
-            # Print progress for large result sets
-            if page > 2:  # Only show progress for multi-page results
-                print(f"  Fetched page {page-1}, total items: {len(results)}")
-            
+            cached_page = cached_pages[page - 1] if page <= len(cached_pages) else {}
+            response = await self._make_request(url, current_params, etag=cached_page.get('etag'))
+            if response is NOT_MODIFIED:
+                return cached_page['data'], cached_page['etag'], '', True
+            if response is None:
+                return None
+            return (await self._decode_json(response) or [], response.headers.get('ETag'),
+                    response.headers.get('Link', ''), False)
+        
+        first_page = await fetch_page(1)
+        if first_page is None:
+            return []
+        
+        pages = [first_page]
+        match = LAST_PAGE_PATTERN.search(first_page[2])
+        if match:
+            last_page = int(match.group(1))
+        elif first_page[3]:
+            # 304s carry no Link header, so start from the cached page count; a
+            # repository gained with an old pushed_at can still grow a later page
+            last_page = len(cached_pages)
+        else:
+            last_page = 1
+        
+        while len(pages) < last_page:
+            new_pages = await asyncio.gather(*(fetch_page(page) for page in range(len(pages) + 1, last_page + 1)))
+            pages.extend(new_pages)
+            # Changed pages report the current page count, which may exceed the cached one
+            for page in new_pages:
+                match = LAST_PAGE_PATTERN.search(page[2]) if page is not None else None
+                if match:
+                    last_page = max(last_page, int(match.group(1)))
+        
+        # Repositories removed since the cached run can leave trailing pages empty
+        while len(pages) > 1 and pages[-1] is not None and not pages[-1][0]:
+            pages.pop()
+        
+        if cache_key and all(page is not None for page in pages):
+            self.cache[cache_key] = {
+                'pages': [{'etag': etag, 'data': data} for data, etag, _, _ in pages],
+                'timestamp': time.time()
+            }
+            self._save_cache(cache_key)
+        
+        results = [item for page in pages if page is not None for item in page[0]]
+        
+        # Print progress for large result sets
+        if len(pages) > 1:
+            print(f"  Fetched {len(pages)} pages, total items: {len(results)}")
+        
         return results
 
-    def get_all_repositories(self) -> List[Dict]:
-        """Get all repositories accessible to the user."""
+    async def get_all_repositories(self) -> List[Dict]:
+        """Get all non-fork, non-empty repositories accessible to the user."""
         print("Fetching personal repositories...")
-        repos = self._get_paginated_data(f"{API_BASE}/user/repos", {"type": "all", "sort": "updated"})
+        repos = await self._get_paginated_data(f"{API_BASE}/user/repos", {"type": "all", "sort": "pushed"},
+                                               cache_key="user_repos")
         
         print("Fetching organization repositories...")
-        orgs_response = self._make_request(f"{API_BASE}/user/orgs")
-        if orgs_response:
-            orgs = orgs_response.json()
+        orgs_response = await self._make_request(f"{API_BASE}/user/orgs")
+        if orgs_response is not None and orgs_response is not NOT_MODIFIED:
+            orgs = await self._decode_json(orgs_response)
             for org in orgs:
                 print(f"  Fetching repos for organization: {org['login']}")
-                org_repos = self._get_paginated_data(f"{API_BASE}/orgs/{org['login']}/repos", {"type": "all"})
+                # type=sources leaves forks out of the listing server-side
+                org_repos = await self._get_paginated_data(f"{API_BASE}/orgs/{org['login']}/repos", {"type": "sources", "sort": "pushed"},
+                                                           cache_key=f"org_repos_{org['login']}")
                 repos.extend(org_repos)
         
-        # Remove duplicates based on full_name
-        seen = set()
-        unique_repos = []
-        for repo in repos:
-            if repo['full_name'] not in seen:
-                seen.add(repo['full_name'])
-                unique_repos.append(repo)
+        # Remove duplicates based on full_name, keeping the first occurrence's position
+        unique_repos = list({repo['full_name']: repo for repo in repos}.values())
         
-        print(f"Found {len(unique_repos)} unique repositories")
-        return unique_repos
+        # Skip forks unless you want to include them, and empty repositories
+        source_repos = [repo for repo in unique_repos if not repo.get('fork', False) and repo.get('size', 0) > 0]
+        
+        print(f"Found {len(unique_repos)} unique repositories, "
+              f"skipping {len(unique_repos) - len(source_repos)} forks and empty repositories")
+        return source_repos
     
-    def get_repository_stats(self, repo: Dict) -> Tuple[int, int]:
+    async def get_repository_stats(self, repo: Dict) -> Tuple[int, int]:
         """Get contribution stats for a specific repository."""
         repo_name = repo['full_name']
         cache_key = f"repo_stats_{repo_name}_v2"  # v2 to invalidate old cache
         
-        # Check cache first (cache for 24 hours)
-        if cache_key in self.cache:
-            cached_data = self.cache[cache_key]
-            if time.time() - cached_data.get('timestamp', 0) < 86400:  # 24 hours
-                return cached_data['additions'], cached_data['deletions']
+        # Nothing was pushed since an exact cached result, so it still holds
+        cached_data = self.cache.get(cache_key, {})
+        if cached_data.get('source') in EXACT_STATS_SOURCES and cached_data.get('pushed_at') == repo.get('pushed_at'):
+            return cached_data['additions'], cached_data['deletions']
         
         print(f"  Analyzing: {repo_name}")
         
-        # Try multiple approaches in order of preference
-        additions, deletions = self._get_stats_from_contributors_with_retry(repo_name)
+        # Exact totals from the user's commit history; the REST statistics are only a fallback
+        history_stats = await self._get_stats_from_commit_history(repo_name)
+        if history_stats is not None:
+            additions, deletions = history_stats
+            self._cache_repository_stats(cache_key, repo, additions, deletions, 'history')
+            return additions, deletions
         
-        if additions == 0 and deletions == 0:
-            additions, deletions = self._get_stats_from_code_frequency(repo_name)
+        # Otherwise fall back to the REST statistics. All approaches run concurrently, so a slow
+        # stats computation doesn't delay the others, and the first useful result is taken in
+        # order of preference. A cached result is revalidated with the ETag it came from, and
+        # both estimates share a single fetch of the user's commit listing.
+        sample = asyncio.create_task(self._get_user_commits_sample(repo_name))
+        sources: List[Tuple[str, Callable[..., Coroutine[Any, Any, StatsResult]]]] = [
+            ('contributors', self._get_stats_from_contributors_with_retry),
+            ('code_frequency', functools.partial(self._get_stats_from_code_frequency, sample=sample)),
+            ('commits', functools.partial(self._get_stats_from_commits_sample, sample=sample)),
+        ]
+        tasks = [
+            asyncio.create_task(get_stats(repo_name, cached_data.get('etag') if cached_data.get('source') == source else None))
+            for source, get_stats in sources
+        ]
+        additions, deletions, etag, stats_source = 0, 0, None, None
+        try:
+            for (source, _), task in zip(sources, tasks):
+                result = await task
+                if result is NOT_MODIFIED:
+                    print(f"    Not modified since last run")
+                    cached_data['timestamp'] = time.time()
+                    if source in EXACT_STATS_SOURCES:
+                        cached_data['pushed_at'] = repo.get('pushed_at')
+                    self._save_cache(cache_key)
+                    return cached_data['additions'], cached_data['deletions']
+                
+                additions, deletions, etag = result
+                if additions > 0 or deletions > 0:
+                    stats_source = source
+                    break
+        finally:
+            # Less preferred approaches still running are no longer needed
+            for task in tasks:
+                task.cancel()
+            sample.cancel()
         
-        if additions == 0 and deletions == 0:
-            additions, deletions = self._get_stats_from_commits_sample(repo_name)
+        self._cache_repository_stats(cache_key, repo, additions, deletions, stats_source, etag)
+        return additions, deletions
+    
+    def _cache_repository_stats(self, cache_key: str, repo: Dict, additions: int, deletions: int,
+                                source: Optional[str], etag: Optional[str] = None):
+        """Cache the results for a repository along with what they were derived from.
         
-        # Cache the results
+        Only exact results get a ``pushed_at``. Estimates and failures (no source)
+        are looked up again next run, so the commit history can replace them.
+        """
         self.cache[cache_key] = {
             'additions': additions,
             'deletions': deletions,
+            'source': source,
+            'etag': etag if source else None,
+            'pushed_at': repo.get('pushed_at') if source in EXACT_STATS_SOURCES else None,
             'timestamp': time.time()
         }
+        self._save_cache(cache_key)
+    
+    async def _get_user_id(self) -> Optional[str]:
+        """Get the GraphQL node ID of the analyzed user, fetching it only once.
         
-        return additions, deletions
+        A failed lookup is not retried for the rest of the run, so repositories
+        don't queue on the lock behind one GraphQL retry cycle after another.
+        """
+        cache_key = f"user_id_{self.username}"
+        if self._graphql_unavailable:
+            return None
+        async with self._user_id_lock:
+            if self._graphql_unavailable:
+                return None
+            if cache_key not in self.cache:
+                data = await self._graphql_request("query($login: String!) { user(login: $login) { id } }",
+                                                   {"login": self.username})
+                user_id = ((data or {}).get('user') or {}).get('id')
+                if not user_id:
+                    self._graphql_unavailable = True
+                    return None
+                self.cache[cache_key] = user_id
+                self._save_cache(cache_key)
+        return self.cache[cache_key]
     
-    def _get_stats_from_contributors_with_retry(self, repo_name: str) -> Tuple[int, int]:
-        """Get stats from contributors API with proper retry logic for 202 responses."""
-        url = f"{API_BASE}/repos/{repo_name}/stats/contributors"
+    async def _get_stats_from_commit_history(self, repo_name: str) -> Optional[Tuple[int, int]]:
+        """Get exact stats by summing the user's commits on the default branch via GraphQL.
         
-        for attempt in range(MAX_STATS_RETRIES):
-            response = self._make_request(url, allow_non_200=True)
-            if not response:
-                return 0, 0
-            
-            if response.status_code == 200:
-                try:
-                    contributors = response.json()
-                    if not contributors:
-                        return 0, 0
-                    
-                    for contributor in contributors:
-                        author = contributor.get('author')
-                        if author and author.get('login') == self.username:
-                            total_additions = sum(week.get('a', 0) for week in contributor.get('weeks', []))
-                            total_deletions = sum(week.get('d', 0) for week in contributor.get('weeks', []))
-                            print(f"    Found contributor data: +{total_additions:,} -{total_deletions:,}")
-                            return total_additions, total_deletions
-                    
-                    return 0, 0  # User not found in contributors
-                    
-                except Exception as e:
-                    print(f"    Error parsing contributors data: {e}")
-                    return 0, 0
-            
-            elif response.status_code == 202:
-                print(f"    Stats computing... waiting {STATS_RETRY_DELAY}s (attempt {attempt+1}/{MAX_STATS_RETRIES})")
-                time.sleep(STATS_RETRY_DELAY)
-                continue
+        Returns None if GraphQL fails, so the caller can fall back to the REST statistics.
+        """
+        user_id = await self._get_user_id()
+        if not user_id:
+            return None
+        
+        owner, name = repo_name.split('/', 1)
+        total_additions = 0
+        total_deletions = 0
+        total_commits = 0
+        cursor = None
+        
+        while True:
+            data = await self._graphql_request(COMMIT_HISTORY_QUERY, {
+                "owner": owner, "name": name, "author": user_id, "cursor": cursor
+            })
+            if data is None:
+                return None
             
-            elif response.status_code == 204:
-                print(f"    No contributor data available")
-                return 0, 0
+            branch = (data.get('repository') or {}).get('defaultBranchRef') or {}
+            history = (branch.get('target') or {}).get('history')
+            if not history:
+                return 0, 0  # Empty repository
             
-            elif response.status_code == 422:
-                print(f"    Repository too large (10k+ commits), trying alternative method")
-                return 0, 0
+            for commit in history['nodes']:
+                total_additions += commit['additions']
+                total_deletions += commit['deletions']
+            total_commits += len(history['nodes'])
             
-            else:
-                print(f"    API Error {response.status_code}: {response.text[:100]}...")
-                return 0, 0
+            if not history['pageInfo']['hasNextPage']:
+                break
+            cursor = history['pageInfo']['endCursor']
+        
+        if total_commits:
+            print(f"    Commit history: +{total_additions:,} -{total_deletions:,} (from {total_commits} commits)")
         
-        print(f"    Stats API timeout after {MAX_STATS_RETRIES} attempts")
-        return 0, 0
+        return total_additions, total_deletions
+    
+    @retry_while_computing()
+    async def _get_stats_response(self, url: str, etag: Optional[str] = None) -> Union[aiohttp.ClientResponse, NotModifiedType, None]:
+        """Request a stats endpoint, retrying while GitHub is still computing it."""
+        return await self._make_request(url, allow_non_200=True, etag=etag)
     
-    def _get_stats_from_code_frequency(self, repo_name: str) -> Tuple[int, int]:
-        """Get stats from code frequency API (repository-wide, then filter by commits)."""
+    async def _get_stats_from_contributors_with_retry(self, repo_name: str, etag: Optional[str] = None) -> StatsResult:
+        """Get stats from contributors API with proper retry logic for 202 responses.
+        
+        Returns ``NOT_MODIFIED`` if ``etag`` still matches the contributors data.
+        Repositories whose stats never finished computing are skipped for
+        STATS_UNAVAILABLE_COOLDOWN instead of waiting through the retries again.
+        """
+        if time.time() - self.cache.get('stats_unavailable', {}).get(repo_name, 0) < STATS_UNAVAILABLE_COOLDOWN:
+            print(f"    Contributor stats recently unavailable, skipping")
+            return 0, 0, None
+        
+        url = f"{API_BASE}/repos/{repo_name}/stats/contributors"
+        response = await self._get_stats_response(url, etag)
+        if response is None:
+            return 0, 0, None
+        if response is NOT_MODIFIED:
+            return NOT_MODIFIED
+        
+        if response.status == 200:
+            try:
+                contributors = await self._decode_json(response)
+                if not contributors:
+                    return 0, 0, None
+                
+                for contributor in contributors:
+                    author = contributor.get('author')
+                    if author and author.get('login') == self.username:
+                        total_additions = total_deletions = 0
+                        for week in contributor.get('weeks', ()):
+                            total_additions += week.get('a', 0)
+                            total_deletions += week.get('d', 0)
+                        print(f"    Found contributor data: +{total_additions:,} -{total_deletions:,}")
+                        return total_additions, total_deletions, response.headers.get('ETag')
+                
+                return 0, 0, None  # User not found in contributors
+                
+            except Exception as e:
+                print(f"    Error parsing contributors data: {e}")
+                return 0, 0, None
+        
+        elif response.status == 202:
+            print(f"    Stats API timeout after {MAX_STATS_RETRIES} attempts")
+            self.cache.setdefault('stats_unavailable', {})[repo_name] = time.time()
+            self._save_cache('stats_unavailable')
+            return 0, 0, None
+        
+        elif response.status == 204:
+            print(f"    No contributor data available")
+            return 0, 0, None
+        
+        elif response.status == 422:
+            print(f"    Repository too large (10k+ commits), trying alternative method")
+            return 0, 0, None
+        
+        else:
+            print(f"    API Error {response.status}: {(await response.text())[:100]}...")
+            return 0, 0, None
+    
+    async def _get_stats_from_code_frequency(self, repo_name: str, etag: Optional[str] = None,
+                                             sample: Optional[asyncio.Task] = None) -> StatsResult:
+        """Get stats from code frequency API (repository-wide, then filter by commits).
+        
+        Returns ``NOT_MODIFIED`` if ``etag`` still matches the code frequency data.
+        ``sample`` is a task already fetching the user's commit listing, if any.
+        """
         url = f"{API_BASE}/repos/{repo_name}/stats/code_frequency"
+        response = await self._get_stats_response(url, etag)
+        if response is None:
+            return 0, 0, None
+        if response is NOT_MODIFIED:
+            return NOT_MODIFIED
         
-        for attempt in range(MAX_STATS_RETRIES):
-            response = self._make_request(url, allow_non_200=True)
-            if not response:
-                return 0, 0
-            
-            if response.status_code == 200:
-                try:
-                    frequency_data = response.json()
-                    if not frequency_data:
-                        return 0, 0
-                    
-                    # This gives us total repo stats, but we need to check if user contributed
-                    # Let's get user's commits to see if they contributed at all
-                    commits = self._get_user_commits_sample(repo_name)
-                    if not commits:
-                        return 0, 0
-                    
-                    # If user has commits, estimate their contribution
-                    # This is rough but better than nothing
-                    total_additions = sum(week[1] for week in frequency_data if len(week) >= 2)
-                    total_deletions = abs(sum(week[2] for week in frequency_data if len(week) >= 3))
-                    
-                    # Scale by user's commit percentage (rough estimate)
-                    user_commits = len(commits)
-                    if user_commits > 0:
-                        # Get total commits (sample)
-                        total_commits_response = self._make_request(f"{API_BASE}/repos/{repo_name}/commits", {"per_page": 1})
-                        if total_commits_response:
-                            # This is a very rough estimation
-                            scaling_factor = min(user_commits / 100, 0.5)  # Cap at 50%
-                            estimated_additions = int(total_additions * scaling_factor)
-                            estimated_deletions = int(total_deletions * scaling_factor)
-                            print(f"    Estimated from code frequency: +{estimated_additions:,} -{estimated_deletions:,}")
-                            return estimated_additions, estimated_deletions
-                    
-                    return 0, 0
-                    
-                except Exception as e:
-                    print(f"    Error parsing code frequency data: {e}")
-                    return 0, 0
-            
-            elif response.status_code == 202:
-                print(f"    Code frequency computing... waiting {STATS_RETRY_DELAY}s")
-                time.sleep(STATS_RETRY_DELAY)
-                continue
-            
-            elif response.status_code == 204:
-                return 0, 0
-            
-            else:
-                return 0, 0
+        if response.status == 200:
+            try:
+                frequency_data = await self._decode_json(response)
+                if not frequency_data:
+                    return 0, 0, None
+                
+                # This gives us total repo stats, but we need to check if user contributed
+                # Let's get user's commits to see if they contributed at all
+                commits, _ = await (sample or self._get_user_commits_sample(repo_name))
+                if not commits:
+                    return 0, 0, None
+                
+                # If user has commits, estimate their contribution
+                # This is rough but better than nothing
+                total_additions = sum(week[1] for week in frequency_data if len(week) >= 2)
+                total_deletions = abs(sum(week[2] for week in frequency_data if len(week) >= 3))
+                
+                # Scale by user's commit percentage (rough estimate)
+                user_commits = len(commits)
+                if user_commits > 0:
+                    # Get total commits (sample)
+                    total_commits_response = await self._make_request(f"{API_BASE}/repos/{repo_name}/commits", {"per_page": 1})
+                    if total_commits_response is not None:
+                        # This is a very rough estimation
+                        scaling_factor = min(user_commits / 100, 0.5)  # Cap at 50%
+                        estimated_additions = int(total_additions * scaling_factor)
+                        estimated_deletions = int(total_deletions * scaling_factor)
+                        print(f"    Estimated from code frequency: +{estimated_additions:,} -{estimated_deletions:,}")
+                        return estimated_additions, estimated_deletions, response.headers.get('ETag')
+                
+                return 0, 0, None
+                
+            except Exception as e:
+                print(f"    Error parsing code frequency data: {e}")
+                return 0, 0, None
         
-        return 0, 0
+        return 0, 0, None
     
-    def _get_user_commits_sample(self, repo_name: str) -> List[Dict]:
-        """Get a sample of user's commits from the repository."""
+    async def _get_user_commits_sample(self, repo_name: str) -> Tuple[List[Dict], Optional[str]]:
+        """Get a sample of user's commits from the repository, with the listing's ETag."""
         try:
             commits_url = f"{API_BASE}/repos/{repo_name}/commits"
-            response = self._make_request(commits_url, {"author": self.username, "per_page": 10})
-            if response:
-                return response.json()
-        except:
+            response = await self._make_request(commits_url, {"author": self.username, "per_page": 10})
+            if response is not None and response is not NOT_MODIFIED:
+                return await self._decode_json(response), response.headers.get('ETag')
+        except Exception:
             pass
-        return []
+        return [], None
     
-    def _get_stats_from_commits_sample(self, repo_name: str) -> Tuple[int, int]:
-        """Get stats by analyzing a sample of individual commits."""
-        commits_url = f"{API_BASE}/repos/{repo_name}/commits"
-        commits = self._get_user_commits_sample(repo_name)
+    async def _get_stats_from_commits_sample(self, repo_name: str, etag: Optional[str] = None,
+                                             sample: Optional[asyncio.Task] = None) -> StatsResult:
+        """Get stats by analyzing a sample of individual commits.
+        
+        Returns ``NOT_MODIFIED`` if ``etag`` still matches the user's commit listing.
+        ``sample`` is a task already fetching the listing, if any. The listing is
+        fetched unconditionally because code frequency needs the commits too, so
+        its ETag is compared with ``etag`` instead of sending a conditional request.
+        """
+        commits, commits_etag = await (sample or self._get_user_commits_sample(repo_name))
+        if etag and commits_etag == etag:
+            return NOT_MODIFIED
         
         if not commits:
-            return 0, 0
+            return 0, 0, None
         
         total_additions = 0
         total_deletions = 0
         
         print(f"    Sampling {len(commits)} recent commits...")
         
-        for i, commit in enumerate(commits[:10]):  # Limit to 10 commits to avoid rate limits
-            sha = commit['sha']
-            commit_response = self._make_request(f"{API_BASE}/repos/{repo_name}/commits/{sha}")
-            
-            if commit_response:
-                commit_data = commit_response.json()
-                stats = commit_data.get('stats', {})
-                additions = stats.get('additions', 0)
-                deletions = stats.get('deletions', 0)
-                total_additions += additions
-                total_deletions += deletions
+        # Fetch line counts for all sampled commits in a single GraphQL round trip
+        sampled_commits = commits[:10]  # Limit to 10 commits to avoid rate limits
+        owner, name = repo_name.split('/', 1)
+        commit_fields = "\n".join(
+            f'c{i}: object(oid: "{commit["sha"]}") {{ ... on Commit {{ additions deletions }} }}'
+            for i, commit in enumerate(sampled_commits)
+        )
+        query = f"query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{ {commit_fields} }} }}"
+        data = await self._graphql_request(query, {"owner": owner, "name": name})
+        
+        if data is not None:
+            commit_stats_list = [stats for stats in (data.get('repository') or {}).values() if stats]
+        else:
+            # GraphQL is unavailable, so fall back to one REST request per commit
+            responses = await asyncio.gather(*(
+                self._make_request(f"{API_BASE}/repos/{repo_name}/commits/{commit['sha']}")
+                for commit in sampled_commits
+            ))
+            commit_stats_list = [
+                (await self._decode_json(response)).get('stats', {})
+                for response in responses if response is not None and response is not NOT_MODIFIED
+            ]
+        
+        for commit_stats in commit_stats_list:
+            total_additions += commit_stats.get('additions', 0)
+            total_deletions += commit_stats.get('deletions', 0)
         
         if total_additions > 0 or total_deletions > 0:
             print(f"    Sample analysis: +{total_additions:,} -{total_deletions:,} (from {len(commits)} commits)")
         
-        return total_additions, total_deletions
+        return total_additions, total_deletions, commits_etag
+    
+    async def _analyze_repository(self, index: int, total: int, repo: Dict) -> Tuple[int, int]:
+        """Analyze a single repository and report its result."""
+        try:
+            print(f"\n[{index}/{total}] {repo['full_name']}")
+            additions, deletions = await self.get_repository_stats(repo)
+            
+            if additions > 0 or deletions > 0:
+                print(f"  ✅ {repo['full_name']}: +{additions:,} -{deletions:,} lines")
+            else:
+                print(f"  ⭕ {repo['full_name']}: No contributions found")
+            return additions, deletions
+                
+        except Exception as e:
+            print(f"  ❌ Error processing {repo['full_name']}: {e}")
+            return 0, 0
     
-    def analyze_all_repositories(self):
+    async def analyze_all_repositories(self):
         """Analyze all repositories and return total stats."""
-        repos = self.get_all_repositories()
+        repos = await self.get_all_repositories()
         
         total_additions = 0
         total_deletions = 0
@@ -322,41 +741,22 @@ class GitHubStatsAnalyzer:
         print(f"\nAnalyzing contributions across {len(repos)} repositories...")
         print("=" * 80)
         
-        for i, repo in enumerate(repos, 1):
-            try:
-                print(f"\n[{i}/{len(repos)}] {repo['full_name']}")
-                
-                # Skip forks unless you want to include them
-                if repo.get('fork', False):
-                    print("  Skipping fork")
-                    continue
-                
-                # Skip empty repositories
-                if repo.get('size', 0) == 0:
-                    print("  Skipping empty repository")
-                    continue
-                
-                additions, deletions = self.get_repository_stats(repo)
-                
-                if additions > 0 or deletions > 0:
-                    print(f"  ✅ +{additions:,} -{deletions:,} lines")
-                    total_additions += additions
-                    total_deletions += deletions
-                    processed_repos += 1
-                    repos_with_contributions.append({
-                        'name': repo['full_name'],
-                        'additions': additions,
-                        'deletions': deletions
-                    })
-                else:
-                    print("  ⭕ No contributions found")
-                    
-            except Exception as e:
-                print(f"  ❌ Error processing {repo['full_name']}: {e}")
-                continue
+        tasks = [
+            asyncio.create_task(self._analyze_repository(i, len(repos), repo))
+            for i, repo in enumerate(repos, 1)
+        ]
+        results = await asyncio.gather(*tasks)
         
-        # Save cache after processing
-        self._save_cache()
+        for repo, (additions, deletions) in zip(repos, results):
+            if additions > 0 or deletions > 0:
+                total_additions += additions
+                total_deletions += deletions
+                processed_repos += 1
+                repos_with_contributions.append({
+                    'name': repo['full_name'],
+                    'additions': additions,
+                    'deletions': deletions
+                })
         
         # Display results
         print("\n" + "=" * 80)
@@ -394,13 +794,14 @@ def main():
     analyzer = GitHubStatsAnalyzer(GITHUB_USERNAME, GITHUB_TOKEN)
     
     try:
-        analyzer.analyze_all_repositories()
+        asyncio.run(analyzer.run())
     except KeyboardInterrupt:
         print("\n\nAnalysis interrupted by user")
-        analyzer._save_cache()
     except Exception as e:
         print(f"\nUnexpected error: {e}")
-        analyzer._save_cache()
+    finally:
+        # Cache entries are saved as they change, so only the database needs closing
+        analyzer._close_cache()
 
 if __name__ == "__main__":
     main()